@@ -8,6 +8,9 @@ from utils.helpers import get_seconds_from_period
 
 from datetime import datetime
 
+DB_POOL_SIZE = 8
+DB_MAX_OVERFLOW = 24
+
 # Define the base class for your table models
 Base = declarative_base()
 class BaseTable(Base):
@@ -141,8 +144,13 @@ class TokenMetricTable(Base):
 class MinerDBManager:
 
     def __init__(self, url = get_postgres_miner_url()) -> None:
-        # Create the SQLAlchemy engine
-        self.engine = create_engine(url)
+        # Create the SQLAlchemy engine backed by a persistent connection pool
+        self.engine = create_engine(
+            url,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_pre_ping=False,
+        )
 
         # Create a configured "Session" class
         self.Session = sessionmaker(bind=self.engine)
@@ -202,20 +210,27 @@ class MinerDBManager:
     def add_tokens(self, tokens: List[Dict[str, Union[str, Integer]]]) -> None:
         """Add tokens to the corresponding table."""
         with self.Session() as session:
+            # Look up all already stored tokens with a single query
+            addresses = {token["address"] for token in tokens}
+            existing_addresses = {
+                address
+                for (address,) in session.query(TokenTable.address)
+                .filter(TokenTable.address.in_(addresses))
+            }
+            new_tokens = []
             for token in tokens:
-                exists = (
-                    session.query(TokenTable)
-                    .filter_by(address=token["address"])
-                    .first()
-                )
-                if not exists:
-                    new_token = TokenTable(
+                if token["address"] in existing_addresses:
+                    continue
+                existing_addresses.add(token["address"])
+                new_tokens.append(
+                    TokenTable(
                         address=token["address"],
                         symbol=token["symbol"],
                         name=token["name"],
                         decimals=token["decimals"],
                     )
-                    session.add(new_token)
+                )
+            session.add_all(new_tokens)
             session.commit()
 
     def add_token_pairs(
@@ -35,15 +35,22 @@ class ValidatorDBManager:
     
     def add_tokens(self, token_infos: List[str], timestamp: int):
         with self.Session() as session:
+            # Fetch the tokens that already exist with a single query
+            existing_tokens = {
+                token_address
+                for (token_address,) in session.query(TokenTable.token_address)
+                .filter(TokenTable.token_address.in_(set(token_infos)))
+            }
+            new_tokens = []
             for token_info in token_infos:
-                # Check if the token already exists
-                existing_token = session.query(TokenTable).filter_by(token_address=token_info).first()
-                if not existing_token:
-                    # If it doesn't exist, create a new record
-                    new_token = TokenTable(token_address=token_info, last_synced_time=timestamp)
-                    session.add(new_token)
+                if token_info in existing_tokens:
+                    continue
+                # If it doesn't exist, create a new record
+                existing_tokens.add(token_info)
+                new_tokens.append(TokenTable(token_address=token_info, last_synced_time=timestamp))
             
-            # Commit all new tokens at once
+            # Insert and commit all new tokens at once
+            session.add_all(new_tokens)
             session.commit()
     
     def getAvailableTokens(self):
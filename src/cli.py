@@ -26,7 +26,9 @@ def serve(
     keypair = classic_load_key(commune_key, password=password)  # type: ignore
     settings = ValidatorSettings()  # type: ignore
 
-    c_client = CommuneClient(get_node_url(use_testnet = use_testnet))  # type: ignore
+    # the validator issues its miner address and key queries concurrently,
+    # so give the client a websocket connection for each of them
+    c_client = CommuneClient(get_node_url(use_testnet = use_testnet), num_connections = 2)  # type: ignore
     validator = VeloraValidator(
         keypair,
         netuid,
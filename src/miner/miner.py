@@ -20,6 +20,7 @@ from db.miner_db import MinerDBManager
 
 START_TIMESTAMP = int(datetime(2021, 5, 4).replace(tzinfo=timezone.utc).timestamp())
 DAY = 60 * 60 * 24
+TOKEN_PAIR_SYNC_INTERVAL = 60 * 5
 
 class Miner(Module):
     """
@@ -43,9 +44,13 @@ class Miner(Module):
         self.sync_token_pairs()
     
     def sync_token_pairs(self) -> None:
+        now = int(datetime.now().timestamp())
+        # synced ranges never change, so only scan for new pools once the last sync is old enough
+        if now - self.last_synced_time < TOKEN_PAIR_SYNC_INTERVAL:
+            return
+        
         log('Syncing token pairs...')
         
-        now = int(datetime.now().timestamp())
         token_pairs = self.uniswap_fetcher_rs.get_pool_created_events_between_two_timestamps(self.last_synced_time, now)
         self.db_manager.add_token_pairs(token_pairs, now)
         self.last_synced_time = now
@@ -14,17 +14,18 @@ Functions:
     extract_address: Extract an address from a string.
     get_subnet_netuid: Retrieve the network UID of the subnet.
     get_ip_port: Get the IP and port information from module addresses.
+    get_process_time_scores: Normalize the process times of miners into scores.
 
 Constants:
     IP_REGEX: A regular expression pattern for matching IP addresses.
 """
 
 import asyncio
-import concurrent.futures
-import json
+import heapq
 import re
 import time
-from functools import partial
+from functools import partial, lru_cache
+from operator import itemgetter
 from datetime import timedelta, datetime, date
 
 from communex.client import CommuneClient  # type: ignore
@@ -54,6 +55,8 @@ import random
 import os
 from dotenv import load_dotenv
 import wandb
+import numpy as np
+import orjson
 
 from db.validator_db import ValidatorDBManager
 
@@ -69,6 +72,11 @@ DAY_SECONDS = 86400
 PREDICTION_SYNAPSE_INTERVAL = 30 * 60
 PREDICTION_CHECK_DELAY = 60
 
+BLOCK_RANGE_CACHE_SIZE = 1024
+BLOCK_RANGE_FINALITY_SECONDS = 15 * 60
+
+MINER_CALL_CONCURRENCY = 32
+
 def check_url_testnet(url: str):
     mainnet_urls = ComxSettings().NODE_URLS
 
@@ -99,27 +107,23 @@ def set_weights(
     # you can replace with `max_allowed_weights` with the amount your subnet allows
     score_dict = cut_to_max_allowed_weights(score_dict, settings.max_allowed_weights)
 
-    # Create a new dictionary to store the weighted scores
-    weighted_scores: dict[int, int] = {}
-
-    # Calculate the sum of all inverted scores
-    scores = sum(score_dict.values())
+    all_uids = np.fromiter(score_dict.keys(), dtype=np.int64, count=len(score_dict))
+    scores = np.fromiter(score_dict.values(), dtype=np.float64, count=len(score_dict))
 
-    # process the scores into weights of type dict[int, int] 
-    # Iterate over the items in the score_dict
-    for uid, score in score_dict.items():
-        # Calculate the normalized weight as an integer
-        weight = int(score * 1000 / scores)
-
-        # Add the weighted score to the new dictionary
-        weighted_scores[uid] = weight
+    # Calculate the sum of all scores
+    scores_sum = scores.sum()
+    if not np.isfinite(scores_sum) or scores_sum <= 0:
+        log(f"Invalid score sum {scores_sum}, skipping the vote")
+        return
 
+    # process the scores into integer weights, truncated like int()
+    all_weights = (scores * 1000 / scores_sum).astype(np.int64)
 
     # filter out 0 weights
-    weighted_scores = {k: v for k, v in weighted_scores.items() if v != 0}
+    mask = all_weights != 0
+    uids = all_uids[mask].tolist()
+    weights = all_weights[mask].tolist()
 
-    uids = list(weighted_scores.keys())
-    weights = list(weighted_scores.values())
     # send the blockchain call
     attempts = 10
     while attempts:
@@ -147,19 +151,35 @@ def cut_to_max_allowed_weights(
     Returns:
         A dictionary mapping miner UIDs to their scores, where the scores have been cut to the maximum allowed weights.
     """
-    # sort the score by highest to lowest
-    sorted_scores = sorted(score_dict.items(), key=lambda x: x[1], reverse=True)
-
-    # cut to max_allowed_weights
-    cut_scores = sorted_scores[:max_allowed_weights]
+    # keep the max_allowed_weights highest scores without sorting all of them
+    cut_scores = heapq.nlargest(max_allowed_weights, score_dict.items(), key=itemgetter(1))
 
     return dict(cut_scores)
 
-def extract_address(string: str):
+def extract_address(string: str) -> tuple[str, str] | None:
     """
     Extracts an address from a string.
+
+    Plain `ip:port` strings are parsed with string splits; anything else
+    falls back to searching for `IP_REGEX` inside the string.
+
+    Returns:
+        A tuple of the IP and port, or None if no address is found.
     """
-    return re.search(IP_REGEX, string)
+    host, _, port = string.rpartition(":")
+    octets = host.split(".")
+    if (
+        port.isdecimal()
+        and len(octets) == 4
+        and all(octet.isdecimal() and len(octet) <= 3 for octet in octets)
+    ):
+        return host, port
+
+    match = IP_REGEX.search(string)
+    if match is None:
+        return None
+    host, _, port = match.group(0).rpartition(":")
+    return host, port
 
 def get_subnet_netuid(clinet: CommuneClient, subnet_name: str = "replace-with-your-subnet-name"):
     """
@@ -193,11 +213,27 @@ def get_ip_port(modules_adresses: dict[int, str]):
         A dictionary mapping module IDs to their IP and port information.
     """
 
-    filtered_addr = {id: extract_address(addr) for id, addr in modules_adresses.items()}
     ip_port = {
-        id: x.group(0).split(":") for id, x in filtered_addr.items() if x is not None
+        id: address
+        for id, addr in modules_adresses.items()
+        if (address := extract_address(addr)) is not None
     }
     return ip_port
+
+def get_process_time_scores(process_times: dict[int, float]) -> dict[int, float]:
+    """
+    Normalize the process times of miners into scores.
+
+    Args:
+        process_times: A dictionary mapping miner UIDs to their process times in seconds.
+
+    Returns:
+        A dictionary mapping miner UIDs to scores from 0.5 (slowest) to 1 (fastest).
+    """
+    times = np.fromiter(process_times.values(), dtype=np.float64, count=len(process_times))
+    scores = 1 - 0.5 * (times - times.min()) / (np.ptp(times) + EPS)
+    return dict(zip(process_times.keys(), scores.tolist()))
+
 class VeloraValidator(Module):
     """
     A class for validating text generated by modules in a subnet.
@@ -233,6 +269,7 @@ class VeloraValidator(Module):
         self.call_timeout = call_timeout
         
         self.uniswap_fetcher_rs = UniswapFetcher(os.getenv('ETHEREUM_RPC_NODE_URL'))
+        self._get_finalized_block_number_range = lru_cache(maxsize=BLOCK_RANGE_CACHE_SIZE)(self.uniswap_fetcher_rs.get_block_number_range)
         self.wandb_running = False
         self.db_manager = ValidatorDBManager()
 
@@ -268,6 +305,17 @@ class VeloraValidator(Module):
         self.new_wandb_run()
         self.wandb_running = True
 
+    def get_block_number_range(self, start_timestamp: int, end_timestamp: int) -> tuple[int, int]:
+        """
+        Get the block number range of a time window.
+
+        Windows that ended before the finality margin can no longer change, so their
+        ranges are memoized; windows that are still open are always fetched.
+        """
+        if end_timestamp < datetime.now().timestamp() - BLOCK_RANGE_FINALITY_SECONDS:
+            return self._get_finalized_block_number_range(start_timestamp, end_timestamp)
+        return self.uniswap_fetcher_rs.get_block_number_range(start_timestamp, end_timestamp)
+
     def get_addresses(self, client: CommuneClient, netuid: int) -> dict[int, str]:
         """
         Retrieve all module addresses from the subnet.
@@ -284,14 +332,18 @@ class VeloraValidator(Module):
         module_addreses = client.query_map_address(netuid)
         return module_addreses
     
-    def retrieve_miner_information(self, velora_netuid):
-        modules_adresses = self.get_addresses(self.client, velora_netuid)
-        modules_keys = self.client.query_map_key(velora_netuid)
+    async def retrieve_miner_information(self, velora_netuid):
+        # both queries are independent blocking RPCs, so issue them concurrently
+        loop = asyncio.get_running_loop()
+        modules_adresses, modules_keys = await asyncio.gather(
+            loop.run_in_executor(None, self.get_addresses, self.client, velora_netuid),
+            loop.run_in_executor(None, self.client.query_map_key, velora_netuid),
+        )
         val_ss58 = self.key.ss58_address
         if val_ss58 not in modules_keys.values():
             raise RuntimeError(f"validator key {val_ss58} is not registered in subnet")
 
-        modules_info: dict[int, tuple[list[str], Ss58Address]] = {}
+        modules_info: dict[int, tuple[tuple[str, str], Ss58Address]] = {}
 
         modules_filtered_address = get_ip_port(modules_adresses)
         for module_id in modules_keys.keys():
@@ -301,10 +353,10 @@ class VeloraValidator(Module):
             modules_info[module_id] = (module_addr, modules_keys[module_id])
         return modules_info
 
-    def _get_miner_prediction(
+    async def _get_miner_prediction(
         self,
         synapse,
-        miner_info: tuple[list[str], Ss58Address],
+        miner_info: tuple[tuple[str, str], Ss58Address],
     ) -> str | None:
         """
         Prompt a miner module to generate an answer to the given question.
@@ -323,18 +375,17 @@ class VeloraValidator(Module):
             # handles the communication with the miner
             current_time = datetime.now()
             miner_answer = dict()
-            response = asyncio.run(
-                client.call(
-                    f'forward{synapse.class_name}',
-                    miner_key,
-                    {"synapse": synapse.dict()},
-                    timeout=self.call_timeout,  #  type: ignore
-                )
+            response = await client.call(
+                f'forward{synapse.class_name}',
+                miner_key,
+                {"synapse": synapse.dict()},
+                timeout=self.call_timeout,  #  type: ignore
             )
-            response = json.loads(response)
-            miner_answer['data'] = class_dict[response['class_name']](**response)
-                
+            # stop the timer before parsing, so it doesn't include decoding work of other miners
             process_time = datetime.now() - current_time
+            
+            response = orjson.loads(response)
+            miner_answer['data'] = class_dict[response['class_name']](**response)
             miner_answer["process_time"] = process_time
 
         except Exception as e:
@@ -343,15 +394,22 @@ class VeloraValidator(Module):
             miner_answer = None
         return miner_answer
     
-    def get_miner_answer(self, modules_info, synapses):
+    async def get_miner_answer(self, modules_info, synapses):
         if not isinstance(synapses, list):
             synapses = [synapses] * len(modules_info)
         log(f"Selected the following miners: {modules_info.keys()}")
 
-        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
-            it = executor.map(lambda x: self._get_miner_prediction(x[0], x[1]), list(zip(synapses, modules_info.values())))
-            answers = [*it]
-            
+        # bound the number of miner calls, and so open sockets, in flight at once
+        semaphore = asyncio.Semaphore(MINER_CALL_CONCURRENCY)
+
+        async def get_bounded_miner_prediction(synapse, miner_info):
+            async with semaphore:
+                return await self._get_miner_prediction(synapse, miner_info)
+
+        tasks = [get_bounded_miner_prediction(synapse, miner_info) for synapse, miner_info in zip(synapses, modules_info.values())]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        answers = [None if isinstance(result, BaseException) else result for result in results]
+
         if not answers:
             log("No miner managed to give an answer")
             return None
@@ -393,35 +451,37 @@ class VeloraValidator(Module):
         start_datetime = miner_prompt.start_datetime
         end_datetime = miner_prompt.end_datetime
         
-        block_number_start, block_number_end = self.uniswap_fetcher_rs.get_block_number_range(start_datetime, end_datetime)
+        block_number_start, block_number_end = self.get_block_number_range(start_datetime, end_datetime)
         
         miner_data = miner_answer.data
-        if miner_data is None:
+        if not miner_data:
             return False
         ANSWER_CHECK_COUNT = 10
-        correct_count = 0
-        for _ in range(ANSWER_CHECK_COUNT):
-            block_data = random.choice(miner_data)
-            block_number = block_data.get("block_number", None)
-            
+        samples = random.sample(miner_data, k=min(ANSWER_CHECK_COUNT, len(miner_data)))
+        block_numbers = [block_data.get("block_number", None) for block_data in samples]
+        for block_number in block_numbers:
             if block_number is None:
                 return False
             if block_number < block_number_start or block_number > block_number_end:
                 return False
-            
-            okay = 0
-            block_data_from_pools = self.uniswap_fetcher_rs.get_pool_events_by_pool_addresses([pool_address], block_number, block_number)
-            for block_data_of_pool in block_data_from_pools.get("data", []):
-                if block_data_of_pool.get("transaction_hash") == block_data.get("transaction_hash"):
-                    okay = 1
-            correct_count += okay
-        return correct_count / ANSWER_CHECK_COUNT
+        
+        # fetch the whole sampled block span at once instead of one rpc call per sample
+        block_data_from_pools = self.uniswap_fetcher_rs.get_pool_events_by_pool_addresses([pool_address], min(block_numbers), max(block_numbers))
+        block_transactions = {
+            (block_data_of_pool.get("block_number"), block_data_of_pool.get("transaction_hash"))
+            for block_data_of_pool in block_data_from_pools.get("data", [])
+        }
+        correct_count = sum(
+            (block_data.get("block_number"), block_data.get("transaction_hash")) in block_transactions
+            for block_data in samples
+        )
+        return correct_count / len(samples)
 
     def get_pool_metric_by_pool_address(self, pool_address: str, timestamp: int, interval: int, token0_decimals: int, token1_decimals: int) -> dict:
         """
         Get the pool metrics by pool address.
         """
-        start_block_number, end_block_number = self.uniswap_fetcher_rs.get_block_number_range(timestamp - interval, timestamp)
+        start_block_number, end_block_number = self.get_block_number_range(timestamp - interval, timestamp)
         pool_events = self.uniswap_fetcher_rs.get_pool_events_by_pool_addresses([pool_address], start_block_number, end_block_number)
         aggregated_data = {
             "total_liquidity": [],
@@ -561,7 +621,6 @@ class VeloraValidator(Module):
             process_time_score[key] = miner_answer["process_time"].total_seconds()
 
             score = self.check_pool_event_accuracy(synapse, miner_answer['data'])
-            time.sleep(0.5)
             # score has to be lower or eq to 1, as one is the best score, you can implement your custom logic
             assert score <= 1
             accuracy_score[key] = score
@@ -569,9 +628,7 @@ class VeloraValidator(Module):
         if(len(process_time_score) == 0):
             return {}
         
-        max_time = max(process_time_score.values())
-        min_time = min(process_time_score.values())
-        process_time_score = {key: 1 - 0.5 * (process_time - min_time) / (max_time - min_time + EPS) for key, process_time in process_time_score.items()}
+        process_time_score = get_process_time_scores(process_time_score)
             
         print(f'pool_events:process_time_score: {process_time_score}')
         print(f'pool_events:accuracy_score: {accuracy_score}')
@@ -617,9 +674,7 @@ class VeloraValidator(Module):
         if len(process_time_score) == 0:
             return {}
         
-        max_time = max(process_time_score.values())
-        min_time = min(process_time_score.values())
-        process_time_score = {key: 1 - 0.5 * (process_time - min_time) / (max_time - min_time + EPS) for key, process_time in process_time_score.items()}
+        process_time_score = get_process_time_scores(process_time_score)
         
         def get_min_max_deviations(deviations: dict):
             min_deviations = {
@@ -697,7 +752,7 @@ class VeloraValidator(Module):
         
         log(f'Synced tokens until {self.last_synced_time}')
     
-    def manage_prediction_synapse(self, miner_infos: dict, settings: ValidatorSettings):
+    async def manage_prediction_synapse(self, miner_infos: dict, settings: ValidatorSettings):
         """
         Manages the timeline of prediction synapses.
         """
@@ -730,7 +785,7 @@ class VeloraValidator(Module):
         tokens = self.db_manager.getAvailableTokens()
         
         synapse = PredictionSynapse(timestamp = next_timestamp_to_predict, token_address = random.choice(tokens))
-        miner_results = self.get_miner_answer(miner_infos, synapse)
+        miner_results = await self.get_miner_answer(miner_infos, synapse)
         self.prediction_results = list(zip(miner_infos.keys(), miner_results))
         
     
@@ -748,12 +803,12 @@ class VeloraValidator(Module):
         """
 
         # retrive the miner information
-        modules_info = self.retrieve_miner_information(velora_netuid)
+        modules_info = await self.retrieve_miner_information(velora_netuid)
 
         score_dict: dict[int, float] = {}
         # Check range
         health_check_synapse = HealthCheckSynapse()
-        health_data = self.get_miner_answer(modules_info, health_check_synapse)
+        health_data = await self.get_miner_answer(modules_info, health_check_synapse)
         miner_results_health_data = list(zip(modules_info.keys(), health_data))
         
         health_score = self.score_health_check(miner_results_health_data)
@@ -766,7 +821,7 @@ class VeloraValidator(Module):
 
         # Check pool events data
         pool_event_check_synapses = self.get_pool_event_synapses(health_data)
-        pool_events = self.get_miner_answer(valid_miner_infos, pool_event_check_synapses)
+        pool_events = await self.get_miner_answer(valid_miner_infos, pool_event_check_synapses)
         
         miner_results_pool_events = list(zip(valid_miner_infos.keys(), pool_events))
 
@@ -774,14 +829,14 @@ class VeloraValidator(Module):
         
         # Check pool_metrics
         pool_metric_event_synapses = self.get_pool_metric_event_synapse(health_data)
-        pool_metric_events = self.get_miner_answer(valid_miner_infos, pool_metric_event_synapses)
+        pool_metric_events = await self.get_miner_answer(valid_miner_infos, pool_metric_event_synapses)
         
         miner_results_pool_metric_events = list(zip(valid_miner_infos.keys(), pool_metric_events))
         
         pool_metric_events_score = self.score_pool_metric_events(pool_metric_event_synapses, miner_results_pool_metric_events)
         
         # Check prediction
-        self.manage_prediction_synapse(valid_miner_infos, settings)
+        await self.manage_prediction_synapse(valid_miner_infos, settings)
         
         score_dict = {key: health_score.get(key, 0) * 0.3 + pool_events_score.get(key, 0) * 0.3 + pool_metric_events_score.get(key, 0) * 0.4 for key in valid_miner_infos.keys()}
 